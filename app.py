@@ -2,19 +2,27 @@
 import os
 import json
 import sys
+import time
+import queue
+import shutil
+import secrets
 import tempfile
-from flask import Flask, request, jsonify, render_template, session
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, request, jsonify, render_template, session, g
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import ServiceUnavailable
 from datetime import datetime, timedelta
 from functools import wraps
 
 # Add python directory to path to import modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "python"))
 from file_extraction import extract_csv, extract_sql
-from auto_analyzer import load_sql_schema_into_sqlite, generate_sql_with_gemini, infer_table_name_from_sql
+from auto_analyzer import load_sql_schema_into_sqlite, load_csv_into_sqlite, fetch_result_rows, generate_sql_with_gemini, BatchingExecutor
 import sqlite3
-import pandas as pd
 
 from dotenv import load_dotenv
 
@@ -22,12 +30,24 @@ from dotenv import load_dotenv
 load_dotenv()
 PORT = int(os.getenv("PORT", "5000"))
 GEMINI_KEY = os.getenv("GEMINI_KEY", "")
+# Opt-in: coalesce concurrent generate-sql requests on the same schema into one Gemini call
+GEMINI_BATCHING = os.getenv("GEMINI_BATCHING", "0") == "1"
+GEMINI_BATCH_WINDOW_MS = int(os.getenv("GEMINI_BATCH_WINDOW_MS", "100"))
+GEMINI_BATCH_MAX = int(os.getenv("GEMINI_BATCH_MAX", "8"))
+GEMINI_BATCH_TIMEOUT = float(os.getenv("GEMINI_BATCH_TIMEOUT", "60"))
 
 # Initialize a simple SQLite file DB for users
 DB_PATH = os.path.join(os.path.dirname(__file__), "users.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+HISTORY_PAGE_SIZE = 50
+# Work factor for new password hashes; existing hashes keep verifying with the method they were stored with
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:200000")
 
 def init_user_db():
     conn = sqlite3.connect(DB_PATH)
+    # WAL is persistent in the DB file, so setting it once here covers every pooled connection
+    conn.execute("PRAGMA journal_mode=WAL;")
     cur = conn.cursor()
     cur.execute(
         """
@@ -52,16 +72,218 @@ def init_user_db():
         );
         """
     )
+    # Serves get_history's per-user, newest-first lookup: scanned in reverse, the ascending
+    # index (with its implicit trailing rowid) yields created_at DESC, id DESC without a sort
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_qh_user_created ON query_history(user_id, created_at);")
     conn.commit()
     cur.close()
     conn.close()
 
 init_user_db()
 
+def _open_db_connection():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # Per-connection tuning: fewer fsyncs under WAL, 64MB page cache, memory-mapped reads
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA cache_size=-65536;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA mmap_size=268435456;")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+# Bounded pool of pre-opened connections shared by all request threads
+_db_pool = queue.Queue(maxsize=DB_POOL_SIZE)
+for _ in range(DB_POOL_SIZE):
+    _db_pool.put(_open_db_connection())
+
 # Flask app setup
 app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), "templates"))
 app.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
+# Cap upload size; each accepted upload is also held in memory by the schema cache
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": "File too large"}), 413
+
+@app.errorhandler(503)
+def service_unavailable(e):
+    return jsonify({"error": "Server busy, try again"}), 503
+
+def get_db():
+    """Borrow a pooled users.db connection for the current app context."""
+    if "db" not in g:
+        try:
+            g.db = _db_pool.get(timeout=DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise ServiceUnavailable()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop("db", None)
+    if conn is None:
+        return
+    try:
+        # Never hand a connection with an open transaction back to the pool
+        conn.rollback()
+    except sqlite3.Error:
+        # Broken connection: swap in a fresh one so the pool never shrinks
+        try:
+            conn.close()
+            conn = _open_db_connection()
+        except sqlite3.Error:
+            pass
+    finally:
+        _db_pool.put(conn)
+
+gemini_batcher = BatchingExecutor(GEMINI_KEY, GEMINI_BATCH_WINDOW_MS / 1000, GEMINI_BATCH_MAX) if GEMINI_BATCHING else None
+
+# Uploads (and their CSV snapshots) live in the temp dir under this prefix and are
+# deleted once older than UPLOAD_RETENTION seconds
+UPLOAD_PREFIX = "vsql_"
+UPLOAD_RETENTION = int(os.getenv("UPLOAD_RETENTION", str(24 * 3600)))
+UPLOAD_CLEANUP_INTERVAL = 600
+_last_upload_cleanup = 0.0
+
+# Prepared in-memory schema DBs, keyed by the token returned from /api/extract-schema.
+# The cache is per process: under multiple gunicorn workers a token only resolves on
+# the worker that issued it, and other workers rebuild from schemaPath (cheap for CSVs
+# thanks to the SQLite snapshot written on first parse).
+# Entries are scoped to the uploading user and bounded by count, total bytes and per-user count.
+SCHEMA_CACHE_TTL = int(os.getenv("SCHEMA_CACHE_TTL", "3600"))
+SCHEMA_CACHE_MAXSIZE = int(os.getenv("SCHEMA_CACHE_MAXSIZE", "32"))
+SCHEMA_CACHE_MAX_MB = int(os.getenv("SCHEMA_CACHE_MAX_MB", "256"))
+SCHEMA_CACHE_PER_USER = int(os.getenv("SCHEMA_CACHE_PER_USER", "2"))
+_schema_cache = OrderedDict()
+_schema_cache_lock = threading.Lock()
+
+def _schema_context(table_name, cols):
+    # Lowercased column set is built once here so per-request heuristics don't rebuild it
+    return {"columns": cols, "columns_lc": frozenset(c.lower() for c in cols), "table_name": table_name}
+
+def _is_upload_path(path):
+    real = os.path.realpath(path)
+    return (os.path.dirname(real) == os.path.realpath(tempfile.gettempdir())
+            and os.path.basename(real).startswith(UPLOAD_PREFIX))
+
+def _cleanup_old_uploads():
+    """Delete uploads, snapshots and stray snapshot temp files older than UPLOAD_RETENTION."""
+    global _last_upload_cleanup
+    now = time.time()
+    # Scanning the temp dir on every upload would be wasteful; once per interval is enough
+    if now - _last_upload_cleanup < UPLOAD_CLEANUP_INTERVAL:
+        return
+    _last_upload_cleanup = now
+    tmp_dir = tempfile.gettempdir()
+    for name in os.listdir(tmp_dir):
+        if not name.startswith(UPLOAD_PREFIX):
+            continue
+        path = os.path.join(tmp_dir, name)
+        try:
+            if now - os.path.getmtime(path) > UPLOAD_RETENTION:
+                os.remove(path)
+        except OSError:
+            pass
+
+def _write_snapshot(conn, snapshot_path):
+    # Write under a unique name and rename into place, so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(snapshot_path), prefix=UPLOAD_PREFIX, suffix=".sqlite.tmp")
+    os.close(fd)
+    try:
+        with closing(sqlite3.connect(tmp_path)) as snapshot:
+            conn.backup(snapshot)
+        os.replace(tmp_path, snapshot_path)
+    except Exception as e:
+        print(f"Error writing schema snapshot: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _prepare_schema_db(schema_path):
+    """Load an uploaded schema into a fresh in-memory SQLite DB. Returns (conn, schema_context)."""
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    table_name = "uploaded_table"
+
+    if schema_path.lower().endswith(".csv"):
+        cols = None
+        # Snapshots only live next to our own uploads; schemaPath comes from the client
+        snapshot_path = schema_path + ".sqlite" if _is_upload_path(schema_path) else None
+        if snapshot_path and os.path.exists(snapshot_path):
+            # Parsed before: copy the typed table back instead of re-reading the CSV
+            try:
+                with closing(sqlite3.connect(snapshot_path)) as snapshot:
+                    snapshot.backup(conn)
+                cols = [row[0] for row in conn.execute("SELECT name FROM pragma_table_info(?)", (table_name,))]
+            except sqlite3.DatabaseError:
+                cols = None
+        if not cols:
+            # No snapshot, or a damaged one without the table: parse the CSV
+            cols = load_csv_into_sqlite(conn, schema_path, table_name)
+            if snapshot_path:
+                _write_snapshot(conn, snapshot_path)
+        return conn, _schema_context(table_name, cols)
+
+    if schema_path.lower().endswith((".sql", ".schema")):
+        tables = load_sql_schema_into_sqlite(conn, schema_path)
+        # Query against the first table created
+        table_name, cols = next(iter(tables.items()), ("uploaded_table", []))
+        return conn, _schema_context(table_name, cols)
+
+    conn.close()
+    raise ValueError("Unsupported file type")
+
+def _db_size(conn):
+    page_count = conn.execute("PRAGMA page_count;").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size;").fetchone()[0]
+    return page_count * page_size
+
+def _schema_cache_put(conn, schema_context, user_id, schema_path, token=None):
+    """Cache a prepared schema DB for user_id under token (a new one if not given) and return it."""
+    # Shared across requests, so generated SQL must not be able to modify it
+    conn.execute("PRAGMA query_only=ON;")
+    token = token or secrets.token_urlsafe(16)
+    size = _db_size(conn)
+    max_bytes = SCHEMA_CACHE_MAX_MB * 1024 * 1024
+    if size > max_bytes:
+        # Too big to keep; generate-sql rebuilds it from schemaPath instead
+        return token
+
+    entry = {
+        "conn": conn,
+        "schema_context": schema_context,
+        "schema_path": schema_path,
+        "lock": threading.Lock(),
+        "expires_at": time.time() + SCHEMA_CACHE_TTL,
+        "size": size,
+    }
+    with _schema_cache_lock:
+        # Evicted connections are left to close on garbage collection, since an
+        # in-flight request may still be using one
+        _schema_cache.pop((user_id, token), None)
+        user_keys = [key for key in _schema_cache if key[0] == user_id]
+        for key in user_keys[:max(0, len(user_keys) - SCHEMA_CACHE_PER_USER + 1)]:
+            del _schema_cache[key]
+        total = sum(e["size"] for e in _schema_cache.values())
+        while _schema_cache and (len(_schema_cache) >= SCHEMA_CACHE_MAXSIZE or total + size > max_bytes):
+            _, evicted = _schema_cache.popitem(last=False)
+            total -= evicted["size"]
+        _schema_cache[(user_id, token)] = entry
+    return token
+
+def _schema_cache_get(token, user_id):
+    key = (user_id, token)
+    with _schema_cache_lock:
+        entry = _schema_cache.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.time():
+            del _schema_cache[key]
+            return None
+        _schema_cache.move_to_end(key)
+        return entry
 
 def login_required(f):
     @wraps(f)
@@ -93,13 +315,12 @@ def login():
     if not username or not password:
         return jsonify({"ok": False, "error": "Missing username or password"}), 400
 
+    conn = get_db()
     try:
-        conn = sqlite3.connect(DB_PATH)
         cur = conn.cursor()
         cur.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,))
         row = cur.fetchone()
         cur.close()
-        conn.close()
 
         if not row:
             return jsonify({"ok": False, "error": "Invalid credentials"}), 401
@@ -126,14 +347,13 @@ def register():
     password = data.get("password")
     if username and password:
         # Store user in SQLite DB with hashed password
+        conn = get_db()
         try:
-            conn = sqlite3.connect(DB_PATH)
             cur = conn.cursor()
-            password_hash = generate_password_hash(password)
+            password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
             cur.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
             conn.commit()
             cur.close()
-            conn.close()
             return jsonify({"ok": True, "redirect": "/"})
         except sqlite3.IntegrityError:
             return jsonify({"ok": False, "error": "Username already exists"}), 400
@@ -158,6 +378,7 @@ def health():
     })
 
 @app.route("/api/extract-schema", methods=["POST"])
+@login_required
 def extract_schema():
     if "file" not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
@@ -170,8 +391,10 @@ def extract_schema():
         return jsonify({"error": "Unsupported file type. Use .csv, .sql, or .schema"}), 400
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            file.save(tmp_file.name)
+        _cleanup_old_uploads()
+        with tempfile.NamedTemporaryFile(delete=False, prefix=UPLOAD_PREFIX, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
+            # 1 MiB chunks instead of Werkzeug's 16 KiB save loop
+            shutil.copyfileobj(file.stream, tmp_file, length=1 << 20)
             temp_file_path = tmp_file.name
         
         # Process the file directly
@@ -182,12 +405,17 @@ def extract_schema():
         else:
             return jsonify({"error": "Unsupported file type. Use .csv, .sql, or .schema"}), 400
         
-        return jsonify({"filePath": temp_file_path, "data": result})
+        # Prepare the query DB now so generate-sql can reuse it by token
+        conn, schema_context = _prepare_schema_db(temp_file_path)
+        token = _schema_cache_put(conn, schema_context, session.get('user_id'), temp_file_path)
+        
+        return jsonify({"schemaToken": token, "filePath": temp_file_path, "data": result})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
-        # Don't delete temp file yet - it will be used by generate-sql
+        # Don't delete temp file yet - generate-sql falls back to it once the token expires;
+        # _cleanup_old_uploads removes it after UPLOAD_RETENTION
         pass
 
 @app.route("/api/generate-sql", methods=["POST"])
@@ -195,56 +423,59 @@ def extract_schema():
 def generate_sql():
     data = request.get_json(force=True)
     nl_query = data.get("query")
+    schema_token = data.get("schemaToken")
     schema_path = data.get("schemaPath")
 
     if not nl_query:
         return jsonify({"error": "Missing query"}), 400
-    if not schema_path or not os.path.exists(schema_path):
+
+    user_id = session.get('user_id')
+    entry = _schema_cache_get(schema_token, user_id) if schema_token else None
+    if entry is not None and schema_path and entry["schema_path"] != schema_path:
+        entry = None
+    if entry is None and (not schema_path or not os.path.exists(schema_path)):
         return jsonify({"error": "Missing or invalid schemaPath"}), 400
 
     try:
-        # Prepare SQLite in-memory DB with schema
-        conn = sqlite3.connect(":memory:")
-        table_name = "uploaded_table"
-        schema_context = {}
-
-        if schema_path.lower().endswith(".csv"):
-            df = pd.read_csv(schema_path)
-            df.to_sql(table_name, conn, index=False, if_exists="replace")
-            schema_context = {"columns": list(df.columns), "table_name": table_name}
-
-        elif schema_path.lower().endswith((".sql", ".schema")):
-            with open(schema_path, "r", encoding="utf-8") as f:
-                sql_text = f.read()
-            load_sql_schema_into_sqlite(conn, schema_path)
-            table_name = infer_table_name_from_sql(sql_text)
-            # Attempt to fetch column info
-            cols = []
-            try:
-                cur = conn.execute(f"PRAGMA table_info({table_name});")
-                cols = [row[1] for row in cur.fetchall()]
-            except Exception:
-                pass
-            schema_context = {"columns": cols, "table_name": table_name}
-
+        if entry is not None:
+            conn = entry["conn"]
+            schema_context = entry["schema_context"]
+            conn_lock = entry["lock"]
         else:
-            return jsonify({"error": "Unsupported file type"}), 400
+            # Token missing, expired or issued by another worker: rebuild from the
+            # uploaded file once, and keep it under the client's token for next time
+            try:
+                conn, schema_context = _prepare_schema_db(schema_path)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            conn_lock = threading.Lock()
+            if schema_token:
+                _schema_cache_put(conn, schema_context, user_id, schema_path, schema_token)
+                entry = _schema_cache_get(schema_token, user_id)
+                if entry is not None:
+                    conn_lock = entry["lock"]
 
         # Generate SQL via Gemini (or fallback)
-        sql_query = generate_sql_with_gemini(nl_query, schema_context, GEMINI_KEY)
+        if gemini_batcher is not None:
+            try:
+                sql_query = gemini_batcher.submit(nl_query, schema_context).result(timeout=GEMINI_BATCH_TIMEOUT)
+            except FutureTimeoutError:
+                return jsonify({"error": "SQL generation timed out"}), 504
+        else:
+            sql_query = generate_sql_with_gemini(nl_query, schema_context, GEMINI_KEY)
 
         # Execute generated SQL
         result_rows = []
+        truncated = False
         try:
-            df_out = pd.read_sql_query(sql_query, conn)
-            result_rows = df_out.to_dict(orient="records")
+            with conn_lock:
+                result_rows, truncated = fetch_result_rows(conn, sql_query)
         except Exception as e:
             return jsonify({"sql": sql_query, "error": f"SQL execution failed: {str(e)}"}), 500
 
         # Save query to history
-        user_id = session.get('user_id')
         try:
-            db_conn = sqlite3.connect(DB_PATH)
+            db_conn = get_db()
             db_cur = db_conn.cursor()
             db_cur.execute(
                 "INSERT INTO query_history (user_id, query, generated_sql, result_count) VALUES (?, ?, ?, ?)",
@@ -252,11 +483,10 @@ def generate_sql():
             )
             db_conn.commit()
             db_cur.close()
-            db_conn.close()
         except Exception as e:
             print(f"Error saving query history: {e}")
 
-        return jsonify({"sql": sql_query, "result": result_rows})
+        return jsonify({"sql": sql_query, "result": result_rows, "truncated": truncated})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -265,20 +495,34 @@ def generate_sql():
 @login_required
 def get_history():
     user_id = session.get('user_id')
+    # Keyset pagination: pass back the previous page's "next" cursor to continue
+    before = request.args.get("before")
+    before_id = request.args.get("before_id", type=int)
+    # Both cursor halves or neither; silently restarting at page 1 would make pagers loop
+    has_cursor = "before" in request.args or "before_id" in request.args
+    if has_cursor and (not before or before_id is None):
+        return jsonify({"error": "before and before_id must both be given, before_id as an integer"}), 400
+    conn = get_db()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT query, generated_sql as sql, created_at FROM query_history WHERE user_id = ? ORDER BY created_at DESC LIMIT 50",
-            (user_id,)
-        )
-        rows = cur.fetchall()
+        if has_cursor:
+            cur = conn.execute(
+                "SELECT id, query, generated_sql as sql, created_at FROM query_history "
+                "WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, before, before_id, HISTORY_PAGE_SIZE)
+            )
+        else:
+            cur = conn.execute(
+                "SELECT id, query, generated_sql as sql, created_at FROM query_history "
+                "WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, HISTORY_PAGE_SIZE)
+            )
+        history = [dict(row) for row in cur]
         cur.close()
-        conn.close()
-        
-        history = [dict(row) for row in rows]
-        return jsonify({"history": history})
+
+        next_page = None
+        if len(history) == HISTORY_PAGE_SIZE:
+            next_page = {"before": history[-1]["created_at"], "before_id": history[-1]["id"]}
+        return jsonify({"history": history, "next": next_page})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -293,5 +537,6 @@ def logout():
     session.clear()
     return jsonify({"ok": True, "redirect": "/"})
 
+# Development server only; in production run: gunicorn -c gunicorn.conf.py app:app
 if __name__ == "__main__":
     app.run(debug=True, port=PORT, host="0.0.0.0")
\ No newline at end of file
@@ -0,0 +1,15 @@
+# Production entrypoint: gunicorn -c gunicorn.conf.py app:app
+# gevent workers let requests blocked on Gemini HTTP calls run concurrently.
+import os
+
+from dotenv import load_dotenv
+
+# gunicorn reads this file before importing app.py, so load .env here too for PORT
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "gevent"
+worker_connections = 1000
+# Leave preload_app off: each worker must open its own users.db connection pool after fork
+preload_app = False
@@ -1,11 +1,200 @@
 # python/auto_analyzer.py
 import os
 import sys
+import csv
 import json
+import mmap
+import time
+import datetime
+import hashlib
 import sqlite3
-import pandas as pd
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 import re
 
+CSV_INSERT_CHUNK = 10000
+RESULT_FETCH_SIZE = 1000
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "10000"))
+
+# Single-pass MySQL -> SQLite cleanup; each named group maps to a replacement in _clean_sub.
+# Bytes patterns so they can run directly over an mmap of the schema file.
+_RE_CLEAN = re.compile(
+    rb"(?P<db_use>^[ \t]*(?:CREATE\s+DATABASE|USE)\s[^\n]*\n?)"
+    rb"|(?P<enum>ENUM\s*\([^)]*\))"
+    rb"|(?P<int_pk>INT\s+AUTO_?INCREMENT\s+PRIMARY\s+KEY)"
+    rb"|(?P<autoinc>AUTO_INCREMENT)"
+    rb"|(?P<unique>\s+UNIQUE(?!\s+KEY))",
+    re.IGNORECASE | re.MULTILINE,
+)
+_CLEAN_REPLACEMENTS = {
+    "db_use": b"",
+    "enum": b"TEXT",
+    "int_pk": b"INTEGER PRIMARY KEY AUTOINCREMENT",
+    "autoinc": b"AUTOINCREMENT",
+    "unique": b"",
+}
+# Statements and table constraints SQLite can't handle: ALTER TABLE ADD, CREATE INDEX, [UNIQUE] KEY, CONSTRAINT
+_RE_STRIP = re.compile(
+    rb"ALTER TABLE\s+\w+\s+ADD[^;]*;"
+    rb"|CREATE INDEX[^;]*;"
+    rb"|,\s*(?:UNIQUE\s+)?KEY\s+[^,)]*"
+    rb"|,\s*CONSTRAINT[^,)]*",
+    re.IGNORECASE,
+)
+
+# Generated SQL cache: key -> (sql, created_at), bounded LRU with TTL eviction
+SQL_CACHE_MAXSIZE = 1024
+SQL_CACHE_TTL = 7 * 24 * 3600
+_sql_cache = OrderedDict()
+_sql_cache_lock = threading.Lock()
+
+def _sql_cache_key(nl_query: str, schema_context: dict) -> str:
+    # Case is kept: SQLite string comparisons are case-sensitive, so "Bob" and "bob" differ
+    nl = " ".join(nl_query.split())
+    table = schema_context.get("table_name", "")
+    cols = ",".join(sorted(schema_context.get("columns", [])))
+    return hashlib.blake2b(f"{nl}|{table}|{cols}".encode(), digest_size=16).hexdigest()
+
+def _sql_cache_get(key: str):
+    with _sql_cache_lock:
+        entry = _sql_cache.get(key)
+        if entry is None:
+            return None
+        sql, created_at = entry
+        if time.time() - created_at > SQL_CACHE_TTL:
+            del _sql_cache[key]
+            return None
+        _sql_cache.move_to_end(key)
+        return sql
+
+def _sql_cache_put(key: str, sql: str):
+    with _sql_cache_lock:
+        _sql_cache[key] = (sql, time.time())
+        _sql_cache.move_to_end(key)
+        while len(_sql_cache) > SQL_CACHE_MAXSIZE:
+            _sql_cache.popitem(last=False)
+
+# Gemini model configured once per API key and reused across requests
+GEMINI_MODEL_NAMES = ("gemini-2.0-flash", "gemini-1.5-flash", "gemini-pro")
+_model = None
+_model_key = None
+_model_lock = threading.Lock()
+
+def _get_model(gemini_key: str):
+    global _model, _model_key
+    with _model_lock:
+        if _model is None or _model_key != gemini_key:
+            import google.generativeai as genai
+            # REST rather than the default gRPC transport: plain sockets cooperate with
+            # gevent workers (see gunicorn.conf.py), gRPC would block the event loop
+            genai.configure(api_key=gemini_key, transport="rest")
+            # Probe once for the latest available model, defaulting to the first
+            model_name = GEMINI_MODEL_NAMES[0]
+            for name in GEMINI_MODEL_NAMES:
+                try:
+                    genai.get_model(f"models/{name}")
+                    model_name = name
+                    break
+                except Exception:
+                    continue
+            _model = genai.GenerativeModel(model_name)
+            _model_key = gemini_key
+        return _model
+
+# Per-schema models whose system instruction is served from Gemini's context cache
+PROMPT_CACHE_TTL = 3600
+# Drop our handle this long before Gemini expires the cached content
+PROMPT_CACHE_EXPIRY_MARGIN = 60
+PROMPT_CACHE_MAXSIZE = 64
+# Gemini rejects context caches below a minimum size; smaller prefixes skip the create call
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "4096"))
+_schema_models = OrderedDict()
+_schema_model_locks = {}
+_schema_models_lock = threading.Lock()
+
+def _build_system_prefix(schema_context: dict) -> str:
+    """Stable instructions + schema block, shared by every question on the same schema."""
+    columns_info = ", ".join(schema_context.get("columns", []))
+    table_name = schema_context.get("table_name", "users")
+    return f"""You are a SQL expert. Convert natural language queries to a valid SQLite SQL query.
+
+Schema:
+- Table: {table_name}
+- Columns: {columns_info}
+
+Important:
+1. Return ONLY the SQL query, nothing else.
+2. Use SQLite syntax.
+3. Do not include explanations or markdown code blocks.
+4. Ensure the query is valid and executable."""
+
+def _cached_schema_model(key: str):
+    with _schema_models_lock:
+        entry = _schema_models.get(key)
+        if entry is not None and entry[1] > time.time():
+            _schema_models.move_to_end(key)
+            return entry[0]
+    return None
+
+def _get_schema_model(gemini_key: str, system_prefix: str):
+    key = hashlib.blake2b(f"{gemini_key}|{system_prefix}".encode(), digest_size=16).hexdigest()
+    model = _cached_schema_model(key)
+    if model is not None:
+        return model
+
+    # One builder per schema, so concurrent first requests don't each create a billed cache
+    with _schema_models_lock:
+        key_lock = _schema_model_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        model = _cached_schema_model(key)
+        if model is not None:
+            return model
+
+        import google.generativeai as genai
+        base_model = _get_model(gemini_key)
+        # Measured before the create call so the local entry never outlives the vendor's
+        expires_at = time.time() + PROMPT_CACHE_TTL - PROMPT_CACHE_EXPIRY_MARGIN
+        model = None
+        # Rough 4 chars/token estimate; below the vendor minimum create() always fails
+        if len(system_prefix) // 4 >= PROMPT_CACHE_MIN_TOKENS:
+            try:
+                cached = genai.caching.CachedContent.create(
+                    model=base_model.model_name,
+                    system_instruction=system_prefix,
+                    ttl=datetime.timedelta(seconds=PROMPT_CACHE_TTL),
+                )
+                model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            except Exception as e:
+                print(f"Gemini context cache unavailable, sending prefix uncached: {e}", file=sys.stderr)
+        if model is None:
+            model = genai.GenerativeModel(base_model.model_name, system_instruction=system_prefix)
+
+        with _schema_models_lock:
+            _schema_models[key] = (model, expires_at)
+            _schema_models.move_to_end(key)
+            while len(_schema_models) > PROMPT_CACHE_MAXSIZE:
+                _schema_models.popitem(last=False)
+            _schema_model_locks.pop(key, None)
+    return model
+
+def _strip_code_fence(text: str, lang: str) -> str:
+    text = text.strip()
+    # Clean up if Gemini wrapped in markdown code blocks
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith(lang):
+            text = text[len(lang):]
+    return text.strip()
+
+def _clean_sql_response(text: str) -> str:
+    sql_query = _strip_code_fence(text, "sql")
+    # Ensure it ends with semicolon
+    if not sql_query.endswith(";"):
+        sql_query += ";"
+    return sql_query
+
 def generate_sql_with_gemini(nl_query: str, schema_context: dict, gemini_key: str) -> str:
     """
     Use Google Gemini API to convert natural language query to SQL.
@@ -13,60 +202,30 @@ def generate_sql_with_gemini(nl_query: str, schema_context: dict, gemini_key: st
     """
     if not gemini_key:
         # Fallback heuristic
-        cols = schema_context.get("columns", [])
+        columns_lc = schema_context.get("columns_lc")
+        if columns_lc is None:
+            columns_lc = frozenset(c.lower() for c in schema_context.get("columns", []))
         table = schema_context.get("table_name", "uploaded_table")
-        if "marks" in [c.lower() for c in cols]:
+        if "marks" in columns_lc:
             return f"SELECT AVG(marks) AS average_marks FROM {table};"
         return f"SELECT COUNT(*) AS row_count FROM {table};"
 
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=gemini_key)
-        
-        # Try to use the latest available model
-        try:
-            model = genai.GenerativeModel("gemini-2.0-flash")
-        except:
-            try:
-                model = genai.GenerativeModel("gemini-1.5-flash")
-            except:
-                model = genai.GenerativeModel("gemini-pro")
-        
-        # Build system context with schema info
-        columns_info = ", ".join(schema_context.get("columns", []))
-        table_name = schema_context.get("table_name", "users")
-        
-        prompt = f"""You are a SQL expert. Convert the following natural language query to a valid SQLite SQL query.
-
-Schema:
-- Table: {table_name}
-- Columns: {columns_info}
+    cache_key = _sql_cache_key(nl_query, schema_context)
+    cached_sql = _sql_cache_get(cache_key)
+    if cached_sql is not None:
+        return cached_sql
 
-Natural language query: {nl_query}
-
-Important:
-1. Return ONLY the SQL query, nothing else.
-2. Use SQLite syntax.
-3. Do not include explanations or markdown code blocks.
-4. Ensure the query is valid and executable.
+    try:
+        system_prefix = _build_system_prefix(schema_context)
+        model = _get_schema_model(gemini_key, system_prefix)
+        prompt = f"""Natural language query: {nl_query}
 
 SQL:"""
         
         response = model.generate_content(prompt)
-        sql_query = response.text.strip()
-        
-        # Clean up if Gemini wrapped in markdown code blocks
-        if sql_query.startswith("```"):
-            sql_query = sql_query.split("```")[1]
-            if sql_query.startswith("sql"):
-                sql_query = sql_query[3:]
-        
-        sql_query = sql_query.strip()
-        
-        # Ensure it ends with semicolon
-        if not sql_query.endswith(";"):
-            sql_query += ";"
+        sql_query = _clean_sql_response(response.text)
         
+        _sql_cache_put(cache_key, sql_query)
         return sql_query
         
     except Exception as e:
@@ -76,52 +235,220 @@ SQL:"""
         table = schema_context.get("table_name", "uploaded_table")
         return f"SELECT COUNT(*) AS row_count FROM {table};"
 
-def load_sql_schema_into_sqlite(conn, schema_path: str):
-    with open(schema_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    
-    # Preprocess lines to remove MySQL-specific syntax
-    cleaned_lines = []
-    for line in lines:
-        # Skip CREATE DATABASE and USE statements
-        if re.match(r"\s*(CREATE\s+DATABASE|USE)\s+", line, re.IGNORECASE):
-            continue
-        # Replace ENUM with TEXT
-        line = re.sub(r"ENUM\s*\([^)]*\)", "TEXT", line, flags=re.IGNORECASE)
-        # Replace AUTO_INCREMENT with AUTOINCREMENT first
-        line = re.sub(r"AUTO_INCREMENT", "AUTOINCREMENT", line, flags=re.IGNORECASE)
-        # Fix INT AUTOINCREMENT PRIMARY KEY -> INTEGER PRIMARY KEY AUTOINCREMENT
-        line = re.sub(r"INT\s+AUTOINCREMENT\s+PRIMARY\s+KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", line, flags=re.IGNORECASE)
-        # Remove UNIQUE constraint from columns
-        line = re.sub(r"\s+UNIQUE(?!\s+KEY)", "", line, flags=re.IGNORECASE)
-        cleaned_lines.append(line)
-    
-    sql_text = "".join(cleaned_lines)
-    
-    # Remove ALTER TABLE ADD CONSTRAINT/KEY statements
-    sql_text = re.sub(r"ALTER TABLE\s+\w+\s+ADD[^;]*;", "", sql_text, flags=re.IGNORECASE | re.MULTILINE)
-    # Remove CREATE INDEX statements  
-    sql_text = re.sub(r"CREATE INDEX[^;]*;", "", sql_text, flags=re.IGNORECASE | re.MULTILINE)
-    
-    # Remove problematic constraints from CREATE TABLE
-    sql_text = re.sub(r",\s*UNIQUE\s+KEY\s+[^,)]*", "", sql_text, flags=re.IGNORECASE)
-    sql_text = re.sub(r",\s*KEY\s+[^,)]*", "", sql_text, flags=re.IGNORECASE)
-    sql_text = re.sub(r",\s*CONSTRAINT[^,)]*", "", sql_text, flags=re.IGNORECASE)
+class BatchingExecutor:
+    """
+    Coalesces concurrent questions against the same schema into one Gemini call.
+    Questions are buffered per schema for up to `window` seconds or `max_batch`
+    questions, then sent as a numbered list with a JSON array requested back.
+    """
+
+    def __init__(self, gemini_key: str, window: float = 0.1, max_batch: int = 8):
+        self.gemini_key = gemini_key
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, nl_query: str, schema_context: dict) -> Future:
+        future = Future()
+        if not self.gemini_key:
+            future.set_result(generate_sql_with_gemini(nl_query, schema_context, self.gemini_key))
+            return future
+
+        cached_sql = _sql_cache_get(_sql_cache_key(nl_query, schema_context))
+        if cached_sql is not None:
+            future.set_result(cached_sql)
+            return future
+
+        system_prefix = _build_system_prefix(schema_context)
+        flush_now = False
+        with self._lock:
+            batch = self._pending.get(system_prefix)
+            if batch is None:
+                batch = {"schema_context": schema_context, "items": []}
+                self._pending[system_prefix] = batch
+                timer = threading.Timer(self.window, self._flush, args=(system_prefix, batch))
+                timer.daemon = True
+                batch["timer"] = timer
+                timer.start()
+            batch["items"].append((future, nl_query))
+            if len(batch["items"]) >= self.max_batch:
+                batch["timer"].cancel()
+                flush_now = True
+        if flush_now:
+            self._flush(system_prefix, batch)
+        return future
+
+    def _flush(self, system_prefix: str, batch: dict):
+        with self._lock:
+            # Another flush (timer vs. full batch) may already have taken it
+            if self._pending.get(system_prefix) is not batch:
+                return
+            del self._pending[system_prefix]
+
+        items = batch["items"]
+        schema_context = batch["schema_context"]
+        questions = [q for _, q in items]
+        error = None
+        try:
+            results = None
+            if len(questions) > 1:
+                try:
+                    results = self._generate_batch(system_prefix, questions)
+                    for nl_query, sql_query in zip(questions, results):
+                        _sql_cache_put(_sql_cache_key(nl_query, schema_context), sql_query)
+                except Exception as e:
+                    print(f"Gemini batch error, answering individually: {e}", file=sys.stderr)
+            if results is None:
+                results = [generate_sql_with_gemini(q, schema_context, self.gemini_key) for q in questions]
+            for (future, _), sql_query in zip(items, results):
+                future.set_result(sql_query)
+        except Exception as e:
+            # Runs on a Timer thread, so surface the failure through the futures instead
+            print(f"Gemini batch failed: {e}", file=sys.stderr)
+            error = e
+        finally:
+            # Whatever happened, no caller may be left waiting on an unresolved future
+            for future, _ in items:
+                if not future.done():
+                    future.set_exception(error or RuntimeError("Gemini batch ended without a result"))
+
+    def _generate_batch(self, system_prefix: str, questions: list) -> list:
+        model = _get_schema_model(self.gemini_key, system_prefix)
+        numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+        prompt = f"""Natural language queries:
+{numbered}
+
+Return ONLY a JSON array of {len(questions)} SQL query strings, one per query, in the same order.
+
+JSON:"""
+        response = model.generate_content(prompt)
+        sql_list = json.loads(_strip_code_fence(response.text, "json"))
+        if not isinstance(sql_list, list) or len(sql_list) != len(questions):
+            raise ValueError("Gemini batch response does not match the number of queries")
+        return [_clean_sql_response(str(sql)) for sql in sql_list]
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _dedupe_csv_header(header: list) -> list:
+    """
+    Name empty headers "Unnamed: i" and suffix repeats as "a.1", "a.2" the way
+    pandas does. SQLite column names are case-insensitive, so "A" and "a" count
+    as repeats too.
+    """
+    columns = []
+    seen = set()
+    for i, name in enumerate(header):
+        name = name if name != "" else f"Unnamed: {i}"
+        candidate, n = name, 0
+        while candidate.lower() in seen:
+            n += 1
+            candidate = f"{name}.{n}"
+        seen.add(candidate.lower())
+        columns.append(candidate)
+    return columns
+
+def load_csv_into_sqlite(conn, path: str, table_name: str = "uploaded_table") -> list:
+    """
+    Stream a CSV file into a SQLite table with executemany, bypassing pandas.
+    Returns the column names from the header row.
+    """
+    # utf-8-sig drops a leading BOM so it doesn't end up in the first column name
+    with open(path, "r", newline="", encoding="utf-8-sig", buffering=1 << 20) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if not header:
+            raise ValueError("CSV file has no header row")
+        columns = _dedupe_csv_header(header)
+        width = len(columns)
+
+        # NUMERIC affinity stores numeric-looking text as numbers, like pandas inference did
+        col_defs = ", ".join(f"{_quote_ident(c)} NUMERIC" for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        quoted_table = _quote_ident(table_name)
+        conn.execute(f"DROP TABLE IF EXISTS {quoted_table};")
+        conn.execute(f"CREATE TABLE {quoted_table} ({col_defs});")
+
+        insert_sql = f"INSERT INTO {quoted_table} VALUES ({placeholders})"
+        # Empty and missing fields become NULL, matching pandas' NaN handling; extra fields are dropped
+        rows = (
+            [v if v != "" else None for v in row[:width]] + [None] * (width - len(row))
+            for row in reader if row
+        )
+        conn.execute("BEGIN")
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, CSV_INSERT_CHUNK))
+                if not chunk:
+                    break
+                conn.executemany(insert_sql, chunk)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return columns
+
+def _clean_sub(m):
+    return _CLEAN_REPLACEMENTS[m.lastgroup]
+
+def load_sql_schema_into_sqlite(conn, schema_path: str) -> dict:
+    """
+    Load a MySQL-flavoured schema file into SQLite.
+    Returns {table_name: [columns]} for the created tables, in creation order.
+    """
+    with open(schema_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        # Let the kernel page the file in lazily instead of copying it onto the heap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Drop CREATE DATABASE/USE, rewrite ENUM and AUTO_INCREMENT, strip column UNIQUE
+            sql_bytes = _RE_CLEAN.sub(_clean_sub, mm)
+    # Remove ALTER TABLE ADD, CREATE INDEX and KEY/CONSTRAINT clauses
+    sql_text = _RE_STRIP.sub(b"", sql_bytes).decode("utf-8")
     
-    # Split and execute
-    for stmt in sql_text.split(";"):
-        stmt = stmt.strip()
-        if stmt and not stmt.startswith("--"):
-            try:
-                conn.execute(stmt)
-                conn.commit()
-            except Exception:
-                pass
+    # Schema DBs are throwaway, so skip durability work
+    conn.execute("PRAGMA synchronous=OFF;")
+    conn.execute("PRAGMA journal_mode=MEMORY;")
 
-def infer_table_name_from_sql(sql_text: str) -> str:
-    # Try to find first CREATE TABLE
-    m = re.search(r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(\w+)", sql_text, re.IGNORECASE)
-    return m.group(1) if m else "uploaded_table"
+    # Split and execute in one transaction; a failing statement only rolls back itself
+    with conn:
+        conn.execute("BEGIN")
+        for stmt in sql_text.split(";"):
+            stmt = stmt.strip()
+            if stmt and not stmt.startswith("--"):
+                try:
+                    conn.execute(stmt)
+                except Exception:
+                    pass
+
+    tables = {}
+    for (table_name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    ).fetchall():
+        cur = conn.execute("SELECT name FROM pragma_table_info(?)", (table_name,))
+        tables[table_name] = [row[0] for row in cur.fetchall()]
+    return tables
+
+def fetch_result_rows(conn, sql_query: str, max_rows: int = MAX_RESULT_ROWS) -> tuple:
+    """
+    Execute a query and return (rows, truncated): up to max_rows rows as dicts,
+    straight from the cursor, and whether the query produced more than that.
+    """
+    cur = conn.execute(sql_query)
+    if cur.description is None:
+        return [], False
+    cols = [d[0] for d in cur.description]
+    rows = []
+    while len(rows) < max_rows:
+        batch = cur.fetchmany(min(RESULT_FETCH_SIZE, max_rows - len(rows)))
+        if not batch:
+            break
+        rows.extend(dict(zip(cols, r)) for r in batch)
+    # One extra fetch tells a full result apart from a cut-off one
+    truncated = len(rows) == max_rows and cur.fetchone() is not None
+    cur.close()
+    return rows, truncated
 
 def main():
     if len(sys.argv) < 3:
@@ -139,32 +466,16 @@ def main():
         schema_context = {}
 
         if schema_path.lower().endswith(".csv"):
-            df = pd.read_csv(schema_path)
-            df.to_sql(table_name, conn, index=False, if_exists="replace")
-            schema_context = {"columns": list(df.columns), "table_name": table_name}
+            cols = load_csv_into_sqlite(conn, schema_path, table_name)
+            schema_context = {"columns": cols, "table_name": table_name}
 
         elif schema_path.lower().endswith((".sql", ".schema")):
-            with open(schema_path, "r", encoding="utf-8") as f:
-                sql_text = f.read()
-            
-            # Debug: Print first 500 chars after processing
-            load_sql_schema_into_sqlite(conn, schema_path)
-            
-            # Verify tables were created
-            cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cur.fetchall()
+            tables = load_sql_schema_into_sqlite(conn, schema_path)
             
             if not tables:
                 print(json.dumps({"error": "No tables created from schema. Schema may have unsupported syntax."}), file=sys.stderr)
             
-            table_name = infer_table_name_from_sql(sql_text)
-            # Attempt to fetch column info
-            cols = []
-            try:
-                cur = conn.execute(f"PRAGMA table_info({table_name});")
-                cols = [row[1] for row in cur.fetchall()]
-            except Exception:
-                pass
+            table_name, cols = next(iter(tables.items()), ("uploaded_table", []))
             schema_context = {"columns": cols, "table_name": table_name}
 
         else:
@@ -176,14 +487,14 @@ def main():
 
         # Execute generated SQL
         result_rows = []
+        truncated = False
         try:
-            df_out = pd.read_sql_query(sql_query, conn)
-            result_rows = df_out.to_dict(orient="records")
+            result_rows, truncated = fetch_result_rows(conn, sql_query)
         except Exception as e:
             print(json.dumps({"sql": sql_query, "error": f"SQL execution failed: {str(e)}"}))
             return
 
-        print(json.dumps({"sql": sql_query, "result": result_rows}, indent=2))
+        print(json.dumps({"sql": sql_query, "result": result_rows, "truncated": truncated}, indent=2))
 
     except Exception as e:
         print(json.dumps({"error": str(e)}))
@@ -1,43 +1,113 @@
 import pandas as pd
+import csv
 import sys
 import os
 import json
 import re
+from collections import Counter
+
+# Start of a CREATE TABLE (group 1 = name, group 2 = opening paren if on the same line) or INSERT (group 3)
+_RE_STATEMENT = re.compile(
+    r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(\w+)\s*(\()?|INSERT INTO\s+(\w+)",
+    re.IGNORECASE,
+)
+_RE_BODY_TOKEN = re.compile(r"'(?:[^'\\\n]|\\.)*'|\"(?:[^\"\\\n]|\\.)*\"|[();]")
+_RE_COL = re.compile(r"(\w+)\s+\w+")
+
+def count_csv_rows(file_path):
+    """Count data rows by streaming the file, without type inference or a DataFrame."""
+    with open(file_path, "r", newline="", encoding="utf-8-sig", buffering=1 << 20) as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        return sum(1 for row in reader if row)
 
 def extract_csv(file_path):
-    df = pd.read_csv(file_path)
+    # Only the preview rows are needed, so don't parse the whole file into pandas;
+    # they're rendered as text, so skip per-column type inference too
+    df_head = pd.read_csv(file_path, nrows=10, engine="c", dtype=str)
     return {
-        "columns": list(df.columns),
-        "rows": df.head(10).to_dict(orient="records"),
-        "row_count": len(df)
+        "columns": list(df_head.columns),
+        "rows": df_head.to_dict(orient="records"),
+        "row_count": count_csv_rows(file_path)
     }
 
 def extract_sql(file_path):
+    """
+    Stream the SQL file line by line, so memory stays bounded by the longest
+    CREATE TABLE body rather than the whole dump.
+    """
+    tables = {}
+    insert_counts = Counter()
+
+    create_name = None   # table whose CREATE TABLE body (or opening paren) we're waiting on
+    create_body = None   # list of body fragments once inside the parens
+    depth = 0
+    in_insert = False
+
     with open(file_path, "r", encoding="utf-8") as f:
-        sql_content = f.read()
+        for line in f:
+            pos = 0
+            while pos < len(line):
+                if in_insert:
+                    # Skip the rest of the INSERT statement
+                    end = line.find(";", pos)
+                    if end == -1:
+                        break
+                    in_insert = False
+                    pos = end + 1
+                elif create_body is not None:
+                    # Body ends when parens balance, or at a ";" as a backstop;
+                    # quoted literals such as DEFAULT ':)' are skipped over
+                    for m in _RE_BODY_TOKEN.finditer(line, pos):
+                        token = m.group()
+                        if token[0] in "'\"":
+                            continue
+                        if token == ";":
+                            create_body.append(line[pos:m.start()])
+                            pos = m.end()
+                            break
+                        depth += 1 if token == "(" else -1
+                        if depth == 0:
+                            create_body.append(line[pos:m.start()])
+                            pos = m.end()
+                            break
+                    else:
+                        create_body.append(line[pos:])
+                        break
+                    # Extract column names
+                    columns = _RE_COL.findall("".join(create_body))
+                    tables[create_name] = {
+                        "columns": columns[:20],  # Limit to first 20 columns
+                        "create_statement": f"CREATE TABLE {create_name} (...)"
+                    }
+                    create_name, create_body = None, None
+                elif create_name is not None:
+                    # CREATE TABLE name on a previous line, still waiting for "("
+                    rest = line[pos:].lstrip()
+                    if not rest:
+                        break
+                    if rest.startswith("("):
+                        create_body, depth = [], 1
+                        pos = len(line) - len(rest) + 1
+                    else:
+                        create_name = None
+                else:
+                    m = _RE_STATEMENT.search(line, pos)
+                    if not m:
+                        break
+                    pos = m.end()
+                    if m.group(3):
+                        insert_counts[m.group(3)] += 1
+                        in_insert = True
+                    else:
+                        create_name = m.group(1)
+                        if m.group(2):
+                            create_body, depth = [], 1
 
-    tables = {}
-    # Find CREATE TABLE statements
-    create_table_pattern = r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(\w+)\s*\((.*?)\);"
-    matches = re.findall(create_table_pattern, sql_content, re.IGNORECASE | re.DOTALL)
-    
-    for table_name, table_def in matches:
-        tables[table_name] = {
-            "columns": [],
-            "create_statement": f"CREATE TABLE {table_name} (...)"
-        }
-        # Extract column names
-        columns = re.findall(r"(\w+)\s+\w+", table_def)
-        tables[table_name]["columns"] = columns[:20]  # Limit to first 20 columns
-    
-    # Find INSERT INTO statements grouped by table
-    insert_pattern = r"INSERT INTO\s+(\w+).*?;"
-    insert_statements = re.findall(insert_pattern, sql_content, re.IGNORECASE | re.DOTALL)
-    
-    for table_name in set(insert_statements):
+    # INSERT INTO statements grouped by table
+    for table_name, count in insert_counts.items():
         if table_name not in tables:
             tables[table_name] = {"insert_count": 0, "sample_inserts": []}
-        count = insert_statements.count(table_name)
         tables[table_name]["insert_count"] = count
         tables[table_name]["sample_inserts"] = f"{count} INSERT statements found"
 